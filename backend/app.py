@@ -16,6 +16,7 @@ from typing import List, Dict
 from time import time
 
 from flask import Flask, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -37,6 +38,13 @@ from firebase_admin import firestore
 # Load environment variables
 load_dotenv()
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    # orjson is optional - jsonify falls back to Flask's stdlib json encoder
+    ORJSON_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -44,8 +52,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify() through orjson: the insights and dashboard payloads are large nested dicts"""
+    # Datetimes go through Flask's default() so responses keep the HTTP date format
+    _options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if ORJSON_AVAILABLE else 0
+    
+    def dumps(self, obj, **kwargs):
+        # Pretty-printed debug responses (indent=2) keep the stdlib path
+        if kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options).decode()
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, rather than decoding them to
+        # str and having Flask append the newline and encode the payload back
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
 # Initialize Flask app
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for mobile app
 
 # Configuration
@@ -252,7 +284,7 @@ def ask_question():
         session_id = request.headers.get('X-Session-ID', str(uuid.uuid4()))
         interaction_id = str(uuid.uuid4())
         
-        if snowflake_service.is_available():
+        if snowflake_service.has_analytics():
             snowflake_service.log_interaction(
                 user_id=user_id,
                 session_id=session_id,
@@ -495,7 +527,7 @@ def user_profile():
             profile = firebase_service.get_user_profile(user_id) if firebase_service.is_available() else {}
             
             # Enhance with Snowflake data if available
-            if snowflake_service.is_available():
+            if snowflake_service.has_analytics():
                 insights = snowflake_service.get_user_insights(user_id, days=30)
                 profile['analytics'] = insights
             
@@ -546,7 +578,7 @@ def dashboard():
             }), 400
         
         # Get dashboard data from Snowflake
-        if snowflake_service.is_available():
+        if snowflake_service.has_analytics():
             dashboard_data = snowflake_service.get_dashboard_data(user_id)
             
             # Enhance with Firebase profile if available
@@ -588,7 +620,7 @@ def analytics_insights():
                 'message': 'Please provide X-User-ID header or user_id query parameter'
             }), 400
         
-        if snowflake_service.is_available():
+        if snowflake_service.has_analytics():
             insights = snowflake_service.get_user_insights(user_id, days=days)
             return jsonify(insights)
         else:
@@ -682,40 +714,7 @@ def get_coaching_centers():
         
         # If not found in Firebase, try Snowflake
         if not user_profile and snowflake_service.is_available():
-            try:
-                cursor = snowflake_service.conn.cursor()
-                # Try to select with location_json, fallback to without it
-                try:
-                    cursor.execute("""
-                        SELECT name, age, learning_goals, preferences_json, location_json
-                        FROM user_profiles 
-                        WHERE user_id = %s
-                    """, (user_id,))
-                except:
-                    # location_json column doesn't exist, select without it
-                    cursor.execute("""
-                        SELECT name, age, learning_goals, preferences_json
-                        FROM user_profiles 
-                        WHERE user_id = %s
-                    """, (user_id,))
-                
-                result = cursor.fetchone()
-                if result:
-                    import json
-                    preferences = json.loads(result[3]) if result[3] else {}
-                    # Get location from preferences (stored there as fallback)
-                    location = preferences.get('location', {})
-                    
-                    user_profile = {
-                        'name': result[0],
-                        'age': result[1],
-                        'learning_goals': json.loads(result[2]) if result[2] else [],
-                        'preferences': preferences,
-                        'location': location
-                    }
-                cursor.close()
-            except Exception as e:
-                logger.warning(f"Could not retrieve profile from Snowflake: {e}")
+            user_profile = snowflake_service.get_user_profile(user_id)
         
         # If still no profile, return error
         if not user_profile:
@@ -1009,9 +1008,8 @@ def get_child_profile(child_id):
         snowflake_sessions = []
         trends = {}
         if snowflake_service.is_available():
-            # Get sessions from Snowflake with all enriched columns
-            snowflake_sessions = snowflake_service.get_child_development_sessions(child_id, limit=50)
-            trends = snowflake_service.get_child_longitudinal_analysis(child_id)
+            # Get sessions from Snowflake with all enriched columns, alongside the trends
+            snowflake_sessions, trends = snowflake_service.get_child_sessions_and_trends(child_id, limit=50)
             
             # If we have Snowflake sessions, use them (they have more enriched data)
             if snowflake_sessions:
@@ -1576,7 +1574,7 @@ def build_personalized_context(user_profile, additional_context, memory_context=
         context['emotional_state'] = user_profile.get('emotional_trends', {}).get('overall_mood', 'neutral')
         
         # Enhance with Snowflake analytics if available
-        if snowflake_service.is_available():
+        if snowflake_service.has_analytics():
             user_id = user_profile.get('user_id', 'anonymous')
             insights = snowflake_service.get_user_insights(user_id, days=30)
             